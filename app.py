@@ -1,13 +1,42 @@
 from __future__ import annotations
 
+import gzip
+import hashlib
+import hmac
 import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
+import orjson
 import pandas as pd
-from flask import Flask, jsonify, render_template, request
+import pyarrow as pa
+import pyarrow.parquet as pq
+from flask import Flask, Response, jsonify, render_template, request
+from flask.json.provider import DefaultJSONProvider
+from pyarrow import csv as pacsv
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    # jsonify con orjson: serializzazione in C, array NumPy senza passare da liste Python.
+    # I tipi che orjson non conosce (Decimal, __html__...) passano dal default di Flask
+    def dumps_bytes(self, obj) -> bytes:
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    def dumps(self, obj, **kwargs) -> str:
+        return self.dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / "data"
@@ -18,28 +47,159 @@ ASSET_FILES: Dict[str, str] = {
     "btc": "btc.csv",
 }
 
+# Percorsi risolti una volta: gli asset sono un insieme fisso
+_ASSET_PATHS: Dict[str, Path] = {asset: DATA_DIR / name for asset, name in ASSET_FILES.items()}
+
+DEFAULT_ASSET = "ls80"
+DEFAULT_FREQ = "monthly"
+
 W_LS80 = 0.80
 W_GOLD = 0.15
 W_BTC = 0.05
+WEIGHTS = np.array([W_LS80, W_GOLD, W_BTC])
+
+FREQ_RULES: Dict[str, str] = {
+    "daily": "D", "d": "D",
+    "weekly": "W-FRI", "w": "W-FRI",
+    "monthly": "ME", "m": "ME",
+    "quarterly": "QE", "q": "QE",
+    "yearly": "YE", "y": "YE",
+}
+FREQ_NAMES: Dict[str, str] = {rule: name for name, rule in FREQ_RULES.items() if len(name) > 1}
+
+# regola pandas -> (unità datetime64, lunghezza del periodo in unità, spostamento in unità).
+# Id periodo = (data in unità - spostamento) // lunghezza. W-FRI: il 1970-01-01 è giovedì,
+# quindi con spostamento 2 giorni le settimane vanno da sabato a venerdì
+RESAMPLE_PERIODS: Dict[str, Tuple[str, int, int]] = {
+    "D": ("D", 1, 0),
+    "W-FRI": ("D", 7, 2),
+    "ME": ("M", 1, 0),
+    "QE": ("M", 3, 0),
+    "YE": ("Y", 1, 0),
+}
 
+# Formati data riconosciuti dal primo valore della colonna (parsing C a formato fisso)
+DATE_FORMATS: Tuple[Tuple[re.Pattern, str], ...] = (
+    (re.compile(r"\d{1,2}/\d{1,2}/\d{4}"), "%d/%m/%Y"),
+    (re.compile(r"\d{1,2}\.\d{1,2}\.\d{4}"), "%d.%m.%Y"),
+    (re.compile(r"\d{1,2}-\d{1,2}-\d{4}"), "%d-%m-%Y"),
+    (re.compile(r"\d{4}-\d{2}-\d{2}.*"), "ISO8601"),
+)
 
-def _detect_and_read_csv(path: Path) -> pd.DataFrame:
-    if not path.exists():
-        raise FileNotFoundError(f"File non trovato: {path}")
-    df = pd.read_csv(path, sep=None, engine="python", encoding="utf-8-sig", skip_blank_lines=True)
-    if df is None or df.empty:
-        raise ValueError(f"CSV vuoto o illeggibile: {path.name}")
-    return df
+# Pulizia numeri testuali: spazi (anche non separabili) via, virgola decimale -> punto
+_DECIMAL_COMMA = str.maketrans({" ": "", "\u00a0": "", ",": "."})
+_THOUSANDS_DOT = str.maketrans({" ": "", "\u00a0": "", ".": "", ",": "."})
+
+# Copia Parquet delle serie già parsate, accanto ai CSV: all'avvio si salta il parsing
+_PARQUET_DIR = DATA_DIR / ".cache"
+# Da incrementare quando cambia il risultato di _to_series (o il formato del file):
+# le copie scritte dal codice precedente non vengono più usate
+PARQUET_CACHE_VERSION = "2"
+
+# Ogni quanti secondi il thread in background ricontrolla i CSV e ricostruisce le
+# risposte cambiate (0 = disattivato, si ricostruisce alla prima richiesta)
+REFRESH_INTERVAL = float(os.environ.get("REFRESH_INTERVAL", "10"))
+
+# Token per POST /api/reload (header X-Reload-Token). Senza token la rotta è
+# disponibile solo in sviluppo (FLASK_DEV=1)
+RELOAD_TOKEN = os.environ.get("RELOAD_TOKEN", "")
+
+# /api/data?format=arrow
+ARROW_STREAM_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+# Ultimo errore loggato dal precaricamento per asset/combined: evita di ripeterlo a ogni giro
+_WARM_FAILURES: Dict[str, str] = {}
+
+# Sotto questa dimensione il gzip non ripaga header e CPU del client
+GZIP_MIN_SIZE = 1024
+
+# Serie già parsate + ricampionate per ogni regola, chiave (asset, (dimensione, mtime_ns) del CSV):
+# il parsing e i resample si rifanno solo se il file cambia
+_CACHE: Dict[Tuple[str, Tuple[int, int]], Tuple[pd.Series, Dict[str, pd.Series]]] = {}
+_RESPONSES: Dict[tuple, Tuple[tuple, bytes, Optional[bytes], str]] = {}
+_CACHE_LOCK = threading.Lock()
+
+# Pool condiviso per caricare gli asset in parallelo, senza crearne uno per richiesta
+_POOL = ThreadPoolExecutor(max_workers=len(ASSET_FILES))
+
+
+def _sniff_dialect(head: bytes) -> Tuple[str, str]:
+    # Il separatore più frequente nei primi 4 KB; a parità vince ";" (CSV europei).
+    # Se il separatore non è "," e compaiono virgole, sono decimali: Arrow li converte in lettura
+    counts = {sep: head.count(sep.encode()) for sep in (";", "\t", ",")}
+    best = max(counts, key=counts.get)
+    sep = best if counts[best] else ","
+    decimal = "," if sep != "," and counts[","] else "."
+    return sep, decimal
 
 
-def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df.columns = [str(c).strip().lower() for c in df.columns]
-    return df
+def _header_columns(head: bytes, sep: str) -> List[str]:
+    first = head.split(b"\n", 1)[0].decode("utf-8-sig", errors="replace").rstrip("\r")
+    return [c.strip('"') for c in first.split(sep)]
 
 
-def _pick_date_value_columns(df: pd.DataFrame) -> Tuple[str, str]:
-    cols = list(df.columns)
+def _detect_and_read_csv(path: Path) -> Tuple[pd.DataFrame, str, str]:
+    if not path.exists():
+        raise FileNotFoundError(f"File non trovato: {path}")
+    sep, decimal, include = None, ".", []
+    try:
+        # Lettura normale, non mmap: un CSV troncato mentre è mappato darebbe SIGBUS al
+        # worker invece di un errore gestibile. Sniff e parser usano lo stesso handle
+        with pa.OSFile(str(path), "r") as source:
+            head = source.read_at(min(4096, source.size()), 0)
+            sep, decimal = _sniff_dialect(head)
+            # Colonne data/valore scelte dall'header prima del parsing: Arrow materializza
+            # solo quelle due e la data resta stringa senza inferenza di tipo
+            raw = _header_columns(head, sep)
+            names = _normalize_names(raw)
+            picked = [raw[names.index(c)] for c in _pick_date_value_columns(names)]
+            include = picked if all(raw.count(c) == 1 for c in picked) else []
+            table = pacsv.read_csv(
+                source,
+                parse_options=pacsv.ParseOptions(delimiter=sep),
+                convert_options=pacsv.ConvertOptions(
+                    null_values=["", "NA", "N/A"],
+                    decimal_point=decimal,
+                    include_columns=include,
+                    column_types={picked[0]: pa.string()} if include else None,
+                ),
+            )
+        # Colonne lasciate su buffer Arrow: niente conversione a NumPy/oggetti Python
+        df = table.to_pandas(types_mapper=pd.ArrowDtype)
+    except (pa.ArrowInvalid, KeyError, ValueError):
+        df = _read_csv_pandas(path, sep, decimal, include)
+    if df is None or df.empty:
+        raise ValueError(f"CSV vuoto o illeggibile: {path.name}")
+    df.columns = _normalize_names(df.columns)
+    date_col, value_col = _pick_date_value_columns(list(df.columns))
+    return df, date_col, value_col
+
+
+def _read_csv_pandas(path: Path, sep: Optional[str], decimal: str, include: List[str]) -> pd.DataFrame:
+    # Fallback senza Arrow: motore C con separatore già individuato dallo sniff;
+    # il motore Python (sep=None) resta solo se lo sniff non è arrivato o il C fallisce
+    if sep is not None:
+        try:
+            return pd.read_csv(
+                path,
+                sep=sep,
+                decimal=decimal,
+                usecols=include or None,
+                dtype={include[0]: str} if include else None,
+                engine="c",
+                encoding="utf-8-sig",
+                skip_blank_lines=True,
+            )
+        except (pd.errors.ParserError, ValueError):
+            pass
+    return pd.read_csv(path, sep=None, engine="python", encoding="utf-8-sig", skip_blank_lines=True)
+
+
+def _normalize_names(cols: Iterable) -> List[str]:
+    return [str(c).strip().lower() for c in cols]
+
+
+def _pick_date_value_columns(cols: List[str]) -> Tuple[str, str]:
     date_candidates = {"date", "data", "datetime", "timestamp"}
     value_candidates = {"value", "valore", "close", "prezzo", "price", "adj close", "adj_close", "last"}
 
@@ -54,70 +214,241 @@ def _pick_date_value_columns(df: pd.DataFrame) -> Tuple[str, str]:
     return cols[0], cols[1]
 
 
-def _to_series(df: pd.DataFrame, asset: str) -> pd.Series:
-    df = _normalize_columns(df)
-    date_col, value_col = _pick_date_value_columns(df)
-
-    out = pd.DataFrame()
-    out["date"] = df[date_col]
-    out["value"] = df[value_col]
-
-    out["date"] = pd.to_datetime(out["date"], errors="coerce", dayfirst=True)
-
-    out["value"] = (
-        out["value"]
-        .astype(str)
-        .str.replace(" ", "", regex=False)
-        .str.replace(",", ".", regex=False)
-    )
-    out["value"] = pd.to_numeric(out["value"], errors="coerce")
-
-    out = out.dropna(subset=["date", "value"]).sort_values("date")
+def _date_format(col: pd.Series) -> Optional[str]:
+    valid = col.dropna()
+    if valid.empty:
+        return None
+    sample = str(valid.iloc[0]).strip()
+    return next((fmt for pattern, fmt in DATE_FORMATS if pattern.fullmatch(sample)), None)
+
+
+def _parse_dates(col: pd.Series) -> pd.Series:
+    # Date già convertite in lettura (Arrow inferisce date/timestamp ISO se la colonna
+    # non è fissata a stringa): solo un cast, nessun secondo passaggio nel parser
+    if pd.api.types.is_datetime64_any_dtype(col):
+        try:
+            return col.astype("datetime64[s]")
+        except (TypeError, ValueError):
+            pass
+    # Arrow non toglie gli spazi dalle celle: "02/01/2024 " non passerebbe il formato fisso
+    if pd.api.types.is_string_dtype(col):
+        col = col.str.strip()
+    fmt = _date_format(col)
+    if fmt is None:
+        return pd.to_datetime(col, errors="coerce", dayfirst=True)
+    parsed = pd.to_datetime(col, format=fmt, errors="coerce", cache=True)
+    # Righe non vuote fuori formato: si riprovano con gli altri formati noti e infine
+    # con l'inferenza dayfirst, così una riga anomala non si perde
+    for other in [f for _, f in DATE_FORMATS if f != fmt] + [None]:
+        retry = parsed.isna() & col.notna()
+        if not retry.any():
+            break
+        if other is None:
+            parsed[retry] = pd.to_datetime(col[retry], errors="coerce", dayfirst=True, format="mixed")
+        else:
+            parsed[retry] = pd.to_datetime(col[retry], errors="coerce", format=other)
+    return parsed
+
+
+def _clean_numeric(col: pd.Series) -> pd.Series:
+    # Solo per le colonne che Arrow non ha convertito (es. "1 234,56"): un solo
+    # str.translate per cella invece di replace in cascata
+    col = col.astype(str)
+    # "1.234,56": il punto è separatore delle migliaia
+    thousands_dot = bool(col.str.contains(r"\d\.\d{3},", regex=True).any())
+    col = col.str.translate(_THOUSANDS_DOT if thousands_dot else _DECIMAL_COMMA)
+    # downcast: esce già float32 quando basta, come la serie in cache
+    return pd.to_numeric(col, errors="coerce", downcast="float")
+
+
+def _to_series(df: pd.DataFrame, date_col: str, value_col: str, asset: str) -> pd.Series:
+    # Pulizia decimali europei solo se Arrow non ha già riconosciuto la colonna come numerica
+    values = df[value_col]
+    if not pd.api.types.is_numeric_dtype(values):
+        values = _clean_numeric(values)
+
+    # Frame costruito una volta dalle colonne finali, senza copiare prima quelle grezze
+    out = pd.DataFrame({"date": _parse_dates(df[date_col]), "value": values})
+    out = out.dropna(subset=["date", "value"])
     if out.empty:
         raise ValueError(f"CSV {asset} non contiene righe valide (data/valore).")
-
-    s = out.set_index("date")["value"].astype(float)
-    s = s[~s.index.duplicated(keep="last")]
+    # Niente sort se le date sono già in ordine; i CSV scaricati sono spesso dal più recente:
+    # se strettamente decrescenti basta invertirli. Altrimenti sort stabile, così tra date
+    # uguali "ultimo" resta quello del file
+    step = np.diff(pd.DatetimeIndex(out["date"]).asi8)
+    if (step < 0).all():
+        out = out.iloc[::-1]
+    elif not (step >= 0).all():
+        out = out.sort_values("date", kind="stable")
+
+    s = out.set_index("date")["value"]
+    # Serie ordinata: le date duplicate sono adiacenti, si tiene l'ultima di ogni gruppo
+    # confrontando ogni data con la successiva (niente tabella hash di duplicated())
+    i8 = s.index.asi8
+    keep = np.append(i8[:-1] != i8[1:], True)
+    if not keep.all():
+        s = s[keep]
+    # In cache: float32 su buffer Arrow (zero-copy verso pyarrow.compute) e date al
+    # secondo (pandas non supporta datetime64[D]), metà dei byte
+    s = s.astype("float32[pyarrow]")
+    s.index = s.index.as_unit("s")
     return s
 
 
 def _freq_to_pandas(freq: str) -> str:
-    f = (freq or "monthly").strip().lower()
-    return {
-        "daily": "D", "d": "D",
-        "weekly": "W-FRI", "w": "W-FRI",
-        "monthly": "ME", "m": "ME",
-        "quarterly": "QE", "q": "QE",
-        "yearly": "YE", "y": "YE",
-    }.get(f, "ME")
+    f = (freq or DEFAULT_FREQ).strip().lower()
+    return FREQ_RULES.get(f, "ME")
 
 
-def _resample(s: pd.Series, freq: str) -> pd.Series:
-    return s.resample(_freq_to_pandas(freq)).last().dropna()
+def _canonical_freq(freq: str) -> str:
+    # "m", "MONTHLY", valori sconosciuti... -> "monthly": un solo nome per regola
+    return FREQ_NAMES[_freq_to_pandas(freq)]
 
 
-def _normalize_100(s: pd.Series) -> pd.Series:
+def _resample(s: pd.Series, rule: str) -> pd.Series:
+    # Ultimo valore per periodo senza groupby: sulla serie ordinata è l'ultima
+    # posizione prima che cambi l'id del periodo (un cast datetime64 + un diff)
+    s = s.dropna()
     if s.empty:
         return s
-    base = float(s.iloc[0])
-    if base == 0:
+    # Giornaliero su date già a mezzanotte (la serie è ordinata e senza duplicati): identità
+    if rule == "D" and s.index.is_normalized:
         return s
-    return (s / base) * 100.0
+    unit, length, shift = RESAMPLE_PERIODS[rule]
+    ids = (s.index.to_numpy().astype(f"datetime64[{unit}]").astype(np.int64) - shift) // length
+    last = np.append(np.flatnonzero(ids[1:] != ids[:-1]), len(ids) - 1)
+    # Etichetta pandas: ultimo giorno del periodo = inizio del successivo - 1 giorno
+    ends = ((ids[last] + 1) * length + shift).astype(f"datetime64[{unit}]").astype("datetime64[D]") - 1
+    index = pd.DatetimeIndex(ends.astype(f"datetime64[{s.index.unit}]"))
+    return pd.Series(s.array.take(last), index=index, name=s.name)
 
 
-def _read_asset(asset: str) -> pd.Series:
+def _asset_path(asset: str) -> Path:
     asset = asset.strip().lower()
-    if asset not in ASSET_FILES:
+    path = _ASSET_PATHS.get(asset)
+    if path is None:
         raise ValueError(f"Asset non supportato: {asset}. Disponibili: {list(ASSET_FILES.keys())}")
-    path = DATA_DIR / ASSET_FILES[asset]
-    df = _detect_and_read_csv(path)
-    return _to_series(df, asset)
+    return path
+
+
+def _file_stamp(path: Path) -> Tuple[int, int]:
+    # Dimensione + mtime in ns: cambia anche per riscritture nello stesso secondo.
+    # Una sola stat per richiesta: il file mancante si scopre qui, senza exists() a parte
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File non trovato: {path}") from None
+    return st.st_size, st.st_mtime_ns
+
+
+def _asset_stamp(asset: str) -> Tuple[int, int]:
+    return _file_stamp(_asset_path(asset))
+
+
+def _parquet_path(asset: str) -> Path:
+    return _PARQUET_DIR / f"{asset}.parquet"
+
+
+def _parquet_metadata(stamp: Tuple[int, int]) -> Dict[bytes, bytes]:
+    return {b"csv_stamp": f"{stamp[0]}:{stamp[1]}".encode(), b"cache_version": PARQUET_CACHE_VERSION.encode()}
+
+
+def _read_parquet_cache(asset: str, stamp: Tuple[int, int]) -> Optional[pd.Series]:
+    # Valida solo se scritta dallo stesso CSV (dimensione + mtime_ns nei metadati)
+    # e dalla stessa versione del parsing
+    try:
+        table = pq.read_table(_parquet_path(asset))
+    except (OSError, pa.ArrowInvalid):
+        return None
+    metadata = table.schema.metadata or {}
+    if any(metadata.get(k) != v for k, v in _parquet_metadata(stamp).items()):
+        return None
+    try:
+        # Parquet non ha timestamp al secondo (li salva in ms): si torna all'unità della cache
+        index = pd.DatetimeIndex(table.column("date").to_numpy(), name="date").as_unit("s")
+        values = table.column("value").cast(pa.float32())
+    except (KeyError, TypeError, ValueError, pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        # Schema diverso da quello atteso: si riparte dal CSV, che riscrive il file
+        return None
+    return pd.Series(pd.arrays.ArrowExtensionArray(values), index=index, name="value")
+
+
+def _write_parquet_cache(asset: str, stamp: Tuple[int, int], s: pd.Series) -> None:
+    table = pa.table({"date": pa.array(s.index.to_numpy()), "value": pa.array(s.array)})
+    table = table.replace_schema_metadata(_parquet_metadata(stamp))
+    tmp: Optional[Path] = None
+    try:
+        _PARQUET_DIR.mkdir(exist_ok=True)
+        # File temporaneo unico anche tra thread dello stesso worker (refresher + richieste)
+        fd, name = tempfile.mkstemp(prefix=f"{asset}.", suffix=".tmp", dir=_PARQUET_DIR)
+        os.close(fd)
+        tmp = Path(name)
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, _parquet_path(asset))
+    except OSError as e:
+        # Filesystem in sola lettura: si continua dal CSV, la cache in memoria basta
+        app.logger.info("Cache Parquet %s non scritta: %s", asset, e)
+        if tmp is not None:
+            tmp.unlink(missing_ok=True)
+
+
+def _clear_parquet_cache() -> None:
+    for path in _PARQUET_DIR.glob("*.parquet"):
+        try:
+            path.unlink()
+        except OSError as e:
+            app.logger.warning("Cache Parquet %s non rimossa: %s", path.name, e)
+
+
+def _load_asset(asset: str) -> Tuple[pd.Series, Dict[str, pd.Series]]:
+    path = _asset_path(asset)
+    asset = asset.strip().lower()
+    key = (asset, _file_stamp(path))
+
+    with _CACHE_LOCK:
+        cached = _CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    s = _read_parquet_cache(asset, key[1])
+    if s is None:
+        s = _to_series(*_detect_and_read_csv(path), asset)
+        _write_parquet_cache(asset, key[1], s)
+    entry = (s, {rule: _resample(s, rule) for rule in set(FREQ_RULES.values())})
+    with _CACHE_LOCK:
+        for old in [k for k in _CACHE if k[0] == asset and k != key]:
+            del _CACHE[old]
+        _CACHE[key] = entry
+    return entry
+
+
+def _read_asset(asset: str) -> pd.Series:
+    return _load_asset(asset)[0]
+
+
+def _read_resampled(asset: str, freq: str) -> pd.Series:
+    return _load_asset(asset)[1][_freq_to_pandas(freq)]
+
+
+def _month_labels(index: pd.DatetimeIndex) -> list:
+    # "YYYY-MM" direttamente dal buffer datetime64 (cast a mesi + formattazione NumPy in C),
+    # senza passare per strftime per elemento
+    return np.datetime_as_string(index.to_numpy().astype("datetime64[M]")).tolist()
+
+
+def _base_100(s: pd.Series) -> np.ndarray:
+    # Base 100 e arrotondamento in place su un'unica copia float64 della serie in cache,
+    # senza Series intermedie
+    values = s.to_numpy(dtype=np.float64, copy=True)
+    if len(values) and values[0] != 0:
+        values /= values[0]
+        values *= 100.0
+    return np.round(values, 4, out=values)
 
 
 def _series_to_payload(asset: str, s: pd.Series, freq: str) -> dict:
-    s = _normalize_100(_resample(s, freq))
-    labels = [d.strftime("%Y-%m") for d in s.index.to_pydatetime()]
-    values = [round(float(v), 4) for v in s.values]
+    values = _base_100(s)
+    labels = _month_labels(s.index)
     return {
         "asset": asset,
         "base_date": s.index[0].strftime("%Y-%m-%d") if not s.empty else None,
@@ -128,6 +459,166 @@ def _series_to_payload(asset: str, s: pd.Series, freq: str) -> dict:
     }
 
 
+def _series_to_arrow(asset: str, s: pd.Series, freq: str) -> bytes:
+    # Stessi valori di _series_to_payload come stream IPC Arrow (date + valori base 100):
+    # il client legge direttamente i buffer, senza decodificare JSON
+    table = pa.table(
+        {"date": pa.array(s.index.to_numpy()), "value": _base_100(s)},
+        metadata={"asset": asset, "freq": freq},
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _combined_payload(freq: str) -> dict:
+    # I tre CSV si caricano in parallelo (a cache fredda il parsing Arrow rilascia il GIL)
+    futures = {a: _POOL.submit(_read_resampled, a, freq) for a in ("ls80", "gold", "btc")}
+    series = {a: f.result() for a, f in futures.items()}
+
+    # Solo le date comuni, come intersezione degli int64 (indici ordinati e senza duplicati):
+    # niente allineamento di indici pandas, le righe si prendono per posizione
+    dates = [s.index.asi8 for s in series.values()]
+    common_i8 = np.intersect1d(dates[0], dates[1], assume_unique=True)
+    common_i8 = np.intersect1d(common_i8, dates[2], assume_unique=True)
+    if not len(common_i8):
+        raise ValueError("Dopo allineamento date comuni, non ci sono dati sufficienti.")
+    common = pd.DatetimeIndex(common_i8.view(series["ls80"].index.dtype))
+    # Una riga contigua per asset (3, N)
+    arr = np.vstack([
+        s.to_numpy(dtype=np.float64)[np.searchsorted(d, common_i8)] for s, d in zip(series.values(), dates)
+    ])
+
+    # Base 100 di ogni componente al suo primo punto (come _series_to_payload). La
+    # normalizzazione entra nei pesi: il portafoglio è un solo matmul sui valori grezzi
+    base = np.array([float(s.iloc[0]) for s in series.values()])
+    base[base == 0] = 100.0
+    scale = 100.0 / base
+    portfolio = (WEIGHTS * scale) @ arr
+    benchmark = arr[0] * scale[0]
+    labels = _month_labels(common)
+
+    return {
+        "base_date": common[0].strftime("%Y-%m-%d"),
+        "freq": freq,
+        "labels": labels,
+        "points": len(common),
+        "series": {
+            "benchmark": np.round(benchmark, 4, out=benchmark),
+            "portfolio": np.round(portfolio, 4, out=portfolio),
+        },
+    }
+
+
+def _json_bytes(payload: dict) -> bytes:
+    return app.json.dumps_bytes(payload)
+
+
+def _cached_body(key: tuple, stamp: tuple, build: Callable[[], bytes]) -> Tuple[bytes, Optional[bytes], str]:
+    # Corpo già serializzato (+ versione gzip) ed ETag, validi finché i CSV letti
+    # non cambiano: la compressione si paga una volta, non a ogni richiesta
+    with _CACHE_LOCK:
+        hit = _RESPONSES.get(key)
+    if hit is None or hit[0] != stamp:
+        body = build()
+        gz = gzip.compress(body, compresslevel=6, mtime=0) if len(body) >= GZIP_MIN_SIZE else None
+        hit = (stamp, body, gz, hashlib.blake2b(body, digest_size=16).hexdigest())
+        with _CACHE_LOCK:
+            _RESPONSES[key] = hit
+    return hit[1], hit[2], hit[3]
+
+
+def _data_body(asset: str, freq: str) -> Tuple[bytes, Optional[bytes], str]:
+    return _cached_body(
+        ("data", asset, freq),
+        (_asset_stamp(asset),),
+        lambda: _json_bytes(_series_to_payload(asset, _read_resampled(asset, freq), freq)),
+    )
+
+
+def _arrow_body(asset: str, freq: str) -> Tuple[bytes, Optional[bytes], str]:
+    return _cached_body(
+        ("arrow", asset, freq),
+        (_asset_stamp(asset),),
+        lambda: _series_to_arrow(asset, _read_resampled(asset, freq), freq),
+    )
+
+
+def _combined_body(freq: str) -> Tuple[bytes, Optional[bytes], str]:
+    return _cached_body(
+        ("combined", freq),
+        tuple(_asset_stamp(a) for a in ASSET_FILES),
+        lambda: _json_bytes(_combined_payload(freq)),
+    )
+
+
+def _log_failure(key: str, message: str, *args) -> None:
+    # Il refresher ripete il precaricamento ogni REFRESH_INTERVAL: si logga solo un
+    # errore nuovo o diverso dal precedente, non lo stesso file mancante ogni volta
+    text = message % args
+    if _WARM_FAILURES.get(key) != text:
+        _WARM_FAILURES[key] = text
+        app.logger.warning(text)
+
+
+def _log_recovery(key: str) -> None:
+    if _WARM_FAILURES.pop(key, None) is not None:
+        app.logger.info("Precaricamento %s di nuovo riuscito", key)
+
+
+def _warm_cache() -> Dict[str, int]:
+    # Parsing, resample e risposte di tutti gli asset x frequenze subito:
+    # la prima richiesta non paga né il CSV né la serializzazione
+    loaded: Dict[str, int] = {}
+    futures = {asset: _POOL.submit(_read_asset, asset) for asset in ASSET_FILES}
+    for asset, future in futures.items():
+        try:
+            loaded[asset] = len(future.result())
+        except Exception as e:
+            _log_failure(asset, "Precaricamento %s fallito: %s", asset, e)
+        else:
+            _log_recovery(asset)
+    for freq in FREQ_NAMES.values():
+        for asset in loaded:
+            _data_body(asset, freq)
+        if len(loaded) == len(ASSET_FILES):
+            try:
+                _combined_body(freq)
+            except ValueError as e:
+                _log_failure(f"combined {freq}", "Precaricamento combined %s fallito: %s", freq, e)
+            else:
+                _log_recovery(f"combined {freq}")
+    return loaded
+
+
+def _refresher() -> None:
+    # Un CSV aggiornato viene riletto qui e non dalla prima richiesta successiva;
+    # le richieste continuano comunque a verificare il timbro del file
+    while True:
+        time.sleep(REFRESH_INTERVAL)
+        try:
+            _warm_cache()
+        except Exception as e:
+            _log_failure("refresh", "Aggiornamento cache fallito: %s", e)
+        else:
+            _log_recovery("refresh")
+
+
+def _cached_response(body: bytes, gz: Optional[bytes], etag: str, mimetype: str = "application/json") -> Response:
+    resp = app.response_class(body, mimetype=mimetype)
+    if gz is not None:
+        resp.vary.add("Accept-Encoding")
+        if request.accept_encodings["gzip"]:
+            resp.set_data(gz)
+            resp.headers["Content-Encoding"] = "gzip"
+            # Rappresentazione diversa -> ETag diverso (RFC 9110)
+            etag += "-gzip"
+    resp.set_etag(etag)
+    # If-None-Match uguale -> 304 senza corpo
+    return resp.make_conditional(request)
+
+
 @app.get("/")
 def index():
     # Homepage: templates/index.html
@@ -136,44 +627,49 @@ def index():
 
 @app.get("/api/data")
 def api_data():
-    asset = request.args.get("asset", "ls80")
-    freq = request.args.get("freq", "monthly")
+    asset = request.args.get("asset", DEFAULT_ASSET).strip().lower()
+    freq = _canonical_freq(request.args.get("freq", DEFAULT_FREQ))
     try:
-        s = _read_asset(asset)
-        return jsonify(_series_to_payload(asset, s, freq))
+        if request.args.get("format", "json").strip().lower() == "arrow":
+            return _cached_response(*_arrow_body(asset, freq), mimetype=ARROW_STREAM_MIMETYPE)
+        return _cached_response(*_data_body(asset, freq))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @app.get("/api/combined")
 def api_combined():
-    freq = request.args.get("freq", "monthly")
+    freq = _canonical_freq(request.args.get("freq", DEFAULT_FREQ))
     try:
-        ls80 = _normalize_100(_resample(_read_asset("ls80"), freq))
-        gold = _normalize_100(_resample(_read_asset("gold"), freq))
-        btc = _normalize_100(_resample(_read_asset("btc"), freq))
-
-        df = pd.concat({"ls80": ls80, "gold": gold, "btc": btc}, axis=1).dropna()
-        if df.empty:
-            raise ValueError("Dopo allineamento date comuni, non ci sono dati sufficienti.")
-
-        portfolio = (df["ls80"] * W_LS80) + (df["gold"] * W_GOLD) + (df["btc"] * W_BTC)
-        labels = [d.strftime("%Y-%m") for d in df.index.to_pydatetime()]
-
-        return jsonify({
-            "base_date": df.index[0].strftime("%Y-%m-%d"),
-            "freq": freq,
-            "labels": labels,
-            "points": int(df.shape[0]),
-            "series": {
-                "benchmark": [round(float(v), 4) for v in df["ls80"].values],
-                "portfolio": [round(float(v), 4) for v in portfolio.values],
-            },
-        })
+        return _cached_response(*_combined_body(freq))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.post("/api/reload")
+def api_reload():
+    if RELOAD_TOKEN:
+        allowed = hmac.compare_digest(request.headers.get("X-Reload-Token", "").encode(), RELOAD_TOKEN.encode())
+    else:
+        allowed = os.environ.get("FLASK_DEV") == "1"
+    if not allowed:
+        return jsonify({"error": "Non autorizzato"}), 403
+    # Svuota le cache (anche le copie Parquet su disco) e rilegge i CSV
+    # (normalmente basta il cambio di mtime/dimensione)
+    with _CACHE_LOCK:
+        _CACHE.clear()
+        _RESPONSES.clear()
+        _clear_parquet_cache()
+    return jsonify({"loaded": _warm_cache()})
+
+
+_warm_cache()
+if REFRESH_INTERVAL > 0:
+    threading.Thread(target=_refresher, name="cache-refresher", daemon=True).start()
+
+
 if __name__ == "__main__":
+    # Solo sviluppo locale: in produzione gira sotto gunicorn (vedi Procfile).
+    # Debug/reloader solo con FLASK_DEV=1
     port = int(os.environ.get("PORT", "5000"))
-    app.run(host="0.0.0.0", port=port, debug=True)
+    app.run(host="0.0.0.0", port=port, debug=os.environ.get("FLASK_DEV") == "1", threaded=True)